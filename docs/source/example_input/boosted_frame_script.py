@@ -18,6 +18,7 @@ where fbpic_object is any of the objects or function of FBPIC.
 # Imports
 # -------
 import numpy as np
+from numba import njit, prange
 from scipy.constants import c, e, m_e, m_p
 # Import the relevant structures in FBPIC
 from fbpic.main import Simulation
@@ -91,6 +92,12 @@ ramp_up_b, plateau_b, ramp_down_b = \
 # Relative change divided by w_matched^2 that allows guiding
 rel_delta_n_over_w2 = 1./( np.pi * 2.81e-15 * w_matched**4 * n_e )
 # Define the density function
+# (compiled with numba, so that the profile is evaluated in a single,
+# parallel loop over the macroparticles, without temporary arrays)
+inv_ramp_up_b = 1./ramp_up_b
+inv_ramp_down_b = 1./ramp_down_b
+z_start_ramp_down_b = ramp_up_b + plateau_b
+@njit(parallel=True, fastmath=True)
 def dens_func( z, r ):
     """
     User-defined function: density profile of the plasma
@@ -108,18 +115,15 @@ def dens_func( z, r ):
         Array of relative density, with one element per macroparticles
     """
     # Allocate relative density
-    n = np.ones_like(z)
-    # Make ramp up (note: use boosted-frame values of the ramp length)
-    inv_ramp_up_b = 1./ramp_up_b
-    n = np.where( z<ramp_up_b, z*inv_ramp_up_b, n )
-    # Make ramp down
-    inv_ramp_down_b = 1./ramp_down_b
-    n = np.where( (z >= ramp_up_b+plateau_b) & \
-                  (z < ramp_up_b+plateau_b+ramp_down_b),
-              - (z - (ramp_up_b+plateau_b+ramp_down_b) )*inv_ramp_down_b, n )
-    n = np.where( z >= ramp_up_b+plateau_b+ramp_down_b, 0, n)
-    # Add transverse guiding parabolic profile
-    n = n * ( 1. + rel_delta_n_over_w2 * r**2 )
+    n = np.empty_like(z)
+    for i in prange(len(z)):
+        # Make ramp up, plateau and ramp down
+        # (note: use boosted-frame values of the ramp length)
+        n_z = min( z[i]*inv_ramp_up_b, 1. ) \
+            - max( z[i] - z_start_ramp_down_b, 0. )*inv_ramp_down_b
+        # Suppress density after the ramp down,
+        # and add transverse guiding parabolic profile
+        n[i] = max( n_z, 0. ) * ( 1. + rel_delta_n_over_w2 * r[i]*r[i] )
     return(n)
 
 # The bunch
@@ -88,12 +88,8 @@ track_electrons = False  # Whether to track and write particle ids
 ramp_length = 20.e-6
 def dens_func( z, r ) :
     """Returns relative density at position z and r"""
-    # Allocate relative density
-    n = np.ones_like(z)
-    # Make sine-like ramp
-    n = np.where( z<ramp_length, np.sin(np.pi/2*z/ramp_length)**2, n )
-    # Supress density before the ramp
-    n = np.where( z<0, 0., n )
+    # Make sine-like ramp, and supress density before the ramp
+    n = np.sin( np.pi/2 * np.clip( z/ramp_length, 0., 1. ) )**2
     return(n)
 
 # The interaction length of the simulation (meters)
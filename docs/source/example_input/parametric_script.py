@@ -95,12 +95,8 @@ ramp_length = 40.e-6
 
 def dens_func( z, r ) :
     """Returns relative density at position z and r"""
-    # Allocate relative density
-    n = np.ones_like(z)
-    # Make linear ramp
-    n = np.where( z<ramp_start+ramp_length, (z-ramp_start)/ramp_length, n )
-    # Supress density before the ramp
-    n = np.where( z<ramp_start, 0., n )
+    # Make linear ramp, and supress density before the ramp
+    n = np.clip( (z-ramp_start)/ramp_length, 0., 1. )
     return(n)
 
 # The interaction length of the simulation (meters)
@@ -51,7 +51,8 @@ class Fields(object) :
                   n_order=-1, v_comoving=None, use_pml=False, use_galilean=True,
                   current_correction='cross-deposition', use_cuda=False,
                   smoother=None, create_threading_buffers=False,
-                  use_ruyten_shapes=True, use_modified_volume=True ):
+                  use_ruyten_shapes=True, use_modified_volume=True,
+                  dht_precision='double' ):
         """
         Initialize the components of the Fields object
 
@@ -120,6 +121,11 @@ class Fields(object) :
 
         use_modified_volume: bool, optional
             Whether to use the modified cell volume (only used for m=0)
+
+        dht_precision: string, optional
+            The floating-point precision of the matrix product of the
+            Hankel transform. Either `double` or `single`. (The latter is
+            only used if its accuracy is sufficient ; see the class DHT.)
         """
         # Register the arguments inside the object
         self.Nz = Nz
@@ -151,13 +157,22 @@ class Fields(object) :
         else:
             raise ValueError('Unkown current correction:%s'%current_correction)
 
+        # Register the precision of the Hankel transform
+        if dht_precision == 'double':
+            dht_dtype = np.float64
+        elif dht_precision == 'single':
+            dht_dtype = np.float32
+        else:
+            raise ValueError('Unknown DHT precision: %s' %dht_precision)
+
         # Create the list of the transformers, which convert the fields
         # back and forth between the spatial and spectral grid
         # (one object per azimuthal mode)
         self.trans = []
         for m in range(Nm) :
             self.trans.append( SpectralTransformer(
-                Nz, Nr, m, rmax, use_cuda=self.use_cuda ) )
+                Nz, Nr, m, rmax, use_cuda=self.use_cuda,
+                dht_dtype=dht_dtype ) )
 
         # Create the interpolation grid for each modes
         # (one grid per azimuthal mode)
@@ -319,10 +334,24 @@ class Fields(object) :
         ---------
         fieldtype :
             A string which represents the kind of field to transform
-            (either 'E', 'B', 'E_pml', 'B_pml', 'J', 'rho_next', 'rho_prev')
+            (either 'E', 'B', 'EB', 'E_pml', 'B_pml', 'J', 'rho_next',
+            'rho_prev' ; 'EB' transforms both E and B at once)
         """
         # Use the appropriate transformation depending on the fieldtype.
-        if fieldtype == 'E' :
+        if fieldtype == 'EB' :
+            # Transform each azimuthal grid individually
+            # (E and B are transformed together, with batched Hankel
+            # transforms)
+            for m in range(self.Nm) :
+                self.trans[m].interp2spect_scal_batched(
+                    [ self.interp[m].Ez, self.interp[m].Bz ],
+                    [ self.spect[m].Ez, self.spect[m].Bz ] )
+                self.trans[m].interp2spect_vect_batched(
+                    [ self.interp[m].Er, self.interp[m].Br ],
+                    [ self.interp[m].Et, self.interp[m].Bt ],
+                    [ self.spect[m].Ep, self.spect[m].Bp ],
+                    [ self.spect[m].Em, self.spect[m].Bm ] )
+        elif fieldtype == 'E' :
             # Transform each azimuthal grid individually
             for m in range(self.Nm) :
                 self.trans[m].interp2spect_scal(
@@ -376,10 +405,24 @@ class Fields(object) :
         ---------
         fieldtype :
             A string which represents the kind of field to transform
-            (either 'E', 'B', 'E_pml', 'B_pml', 'J', 'rho_next', 'rho_prev')
+            (either 'E', 'B', 'EB', 'E_pml', 'B_pml', 'J', 'rho_next',
+            'rho_prev' ; 'EB' transforms both E and B at once)
         """
         # Use the appropriate transformation depending on the fieldtype.
-        if fieldtype == 'E' :
+        if fieldtype == 'EB' :
+            # Transform each azimuthal grid individually
+            # (E and B are transformed together, with batched Hankel
+            # transforms)
+            for m in range(self.Nm) :
+                self.trans[m].spect2interp_scal_batched(
+                    [ self.spect[m].Ez, self.spect[m].Bz ],
+                    [ self.interp[m].Ez, self.interp[m].Bz ] )
+                self.trans[m].spect2interp_vect_batched(
+                    [ self.spect[m].Ep, self.spect[m].Bp ],
+                    [ self.spect[m].Em, self.spect[m].Bm ],
+                    [ self.interp[m].Er, self.interp[m].Br ],
+                    [ self.interp[m].Et, self.interp[m].Bt ] )
+        elif fieldtype == 'E' :
             # Transform each azimuthal grid individually
             for m in range(self.Nm) :
                 self.trans[m].spect2interp_scal(
@@ -112,47 +112,52 @@ def cuda_copy_1d_to_2d( array_1d, array_2d ) :
         i = iz + array_2d.shape[0]*ir
         array_2d[iz, ir] = array_1d[i]
 
-# ----------------------------------------------------
-# Functions that combine components in spectral space
-# ----------------------------------------------------
+# ----------------------------------------------------------------
+# Functions that combine components in spectral space, and convert
+# them from/to the real buffers of the Hankel transform
+# ----------------------------------------------------------------
 
 @compile_cupy
-def cuda_rt_to_pm( buffer_r, buffer_t, buffer_p, buffer_m ) :
+def cuda_rt_to_pm_2dR( buffer_r, buffer_t, array_p, array_m ) :
     """
-    Combine the arrays buffer_r and buffer_t to produce the
-    arrays buffer_p and buffer_m, according to the rules of
-    the Fourier-Hankel decomposition (see associated paper)
+    Combine the complex Nz x Nr arrays buffer_r and buffer_t to produce
+    the p and m components, and store them directly in the real
+    2Nz x Nr arrays array_p and array_m (real part in the first Nz elements
+    along z, imaginary part in the next Nz elements), according to the
+    rules of the Fourier-Hankel decomposition (see associated paper)
     """
     # Set up cuda grid
     iz, ir = cuda.grid(2)
+    Nz, Nr = buffer_r.shape
 
-    if (iz < buffer_r.shape[0]) and (ir < buffer_r.shape[1]) :
-        # Use intermediate variables, as the arrays
-        # buffer_r and buffer_t may actually point to the same
-        # object as buffer_p and buffer_m, for economy of memory
+    if (iz < Nz) and (ir < Nr) :
         value_r = buffer_r[iz, ir]
         value_t = buffer_t[iz, ir]
         # Combine the values
-        buffer_p[iz, ir] = 0.5*( value_r - 1.j*value_t )
-        buffer_m[iz, ir] = 0.5*( value_r + 1.j*value_t )
+        value_p = 0.5*( value_r - 1.j*value_t )
+        value_m = 0.5*( value_r + 1.j*value_t )
+        # Store them as real arrays
+        array_p[iz, ir] = value_p.real
+        array_p[iz+Nz, ir] = value_p.imag
+        array_m[iz, ir] = value_m.real
+        array_m[iz+Nz, ir] = value_m.imag
 
 
 @compile_cupy
-def cuda_pm_to_rt( buffer_p, buffer_m, buffer_r, buffer_t ) :
+def cuda_2dR_pm_to_rt( array_p, array_m, buffer_r, buffer_t ) :
     """
-    Combine the arrays buffer_p and buffer_m to produce the
-    arrays buffer_r and buffer_t, according to the rules of
-    the Fourier-Hankel decomposition (see associated paper)
+    Reconstruct the p and m components from the real 2Nz x Nr arrays
+    array_p and array_m, and combine them to produce the
+    complex Nz x Nr arrays buffer_r and buffer_t, according to the
+    rules of the Fourier-Hankel decomposition (see associated paper)
     """
     # Set up cuda grid
     iz, ir = cuda.grid(2)
+    Nz, Nr = buffer_r.shape
 
-    if (iz < buffer_p.shape[0]) and (ir < buffer_p.shape[1]) :
-        # Use intermediate variables, as the arrays
-        # buffer_r and buffer_t may actually point to the same
-        # object as buffer_p and buffer_m, for economy of memory
-        value_p = buffer_p[iz, ir]
-        value_m = buffer_m[iz, ir]
+    if (iz < Nz) and (ir < Nr) :
+        value_p = array_p[iz, ir] + 1.j*array_p[iz+Nz, ir]
+        value_m = array_m[iz, ir] + 1.j*array_m[iz+Nz, ir]
         # Combine the values
         buffer_r[iz, ir] =     ( value_p + value_m )
         buffer_t[iz, ir] = 1.j*( value_p - value_m )
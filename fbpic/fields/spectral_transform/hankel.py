@@ -9,8 +9,13 @@ Definition of the Hankel forward and backward transform of order p:
 g(\nu) = 2 \pi \int_0^\infty f(r) J_p( 2 \pi \nu r) r dr
 f( r ) = 2 \pi \int_0^\infty g(\nu) J_p( 2 \pi \nu r) \nu d\nu d
 """
+import os
+import hashlib
+import multiprocessing
+import tempfile
+import warnings
 import numpy as np
-from scipy.special import jn, jn_zeros
+from scipy.special import jv, jn_zeros
 
 # Check if CUDA is available, then import CUDA functions
 from fbpic.utils.cuda import cuda_installed
@@ -21,13 +26,227 @@ if cuda_installed:
     import cupy
     from cupy.cuda import device, cublas
 
+# Maximal error (on a forward + backward transform) that is accepted
+# when performing the Hankel transform in single precision
+single_precision_tolerance = 1.e-4
+
+# Number of rows of the buffers that are multiplied at once by the matrix
+# of the DHT, on the CPU, when BLAS runs on a single thread (blocks of rows
+# that stay in cache are faster than a single matrix product over the full
+# buffers ; with several threads, the blocks are too small for BLAS to
+# distribute the work efficiently)
+cpu_matmul_tile = 128
+
+def get_blas_nthreads():
+    """
+    Return the number of threads that BLAS uses for the matrix products
+    on the CPU, as set by the environment variables of MKL, OpenBLAS
+    or OpenMP (if none of them is set, BLAS uses all the cores)
+    """
+    for variable in [ 'MKL_NUM_THREADS', 'OPENBLAS_NUM_THREADS',
+                      'OMP_NUM_THREADS' ]:
+        try:
+            return( int( os.environ[variable] ) )
+        except (KeyError, ValueError):
+            pass
+    return( multiprocessing.cpu_count() )
+
+# Zeros of the Bessel functions, for each value of (m, Nr) that has
+# already been used (the three DHT objects of each azimuthal mode,
+# as well as DHT objects from different Fields objects, share them)
+# NB: This cache is never emptied, so it grows with each new value of
+# (m, Nr) in long-lived processes (e.g. scans of Nr in a notebook) ;
+# it can be emptied with `bessel_zeros_cache.clear()`.
+bessel_zeros_cache = {}
+
+def get_bessel_zeros( m, Nr ):
+    """
+    Return the Nr zeros of the Bessel function of order m that define
+    the spectral grid of the DHT (including 0 as the first zero if m!=0)
+
+    The result is stored in `bessel_zeros_cache`, so that it is only
+    calculated once for given values of m and Nr.
+
+    Parameters:
+    ------------
+    m: int
+    The azimuthal mode
+
+    Nr: int
+    Number of points in the r direction
+    """
+    if (m, Nr) not in bessel_zeros_cache:
+        if m !=0:
+            # In this case, 0 is a zero of the Bessel function of order m.
+            # It turns out that it is needed to reconstruct the signal for p=0.
+            alphas = np.hstack( (np.array([0.]), jn_zeros(m, Nr-1)) )
+        else:
+            alphas = jn_zeros(m, Nr)
+        bessel_zeros_cache[(m, Nr)] = alphas
+    return( bessel_zeros_cache[(m, Nr)] )
+
+# Zeros of the Bessel functions and matrices of the DHT, for each value
+# of (p, m, Nr, rmax) that has already been used in this process
+# NB: This cache is never emptied, and each entry takes 2*Nr**2 floats
+# (e.g. 0.64 MB for Nr=200), so that it grows without limit when many
+# values of the parameters are used in long-lived processes (e.g. scans
+# in a notebook) ; it can be emptied with `dht_matrices_cache.clear()`.
+dht_matrices_cache = {}
+
+# Default folder where the matrices of the DHT are stored on disk, in order
+# to be reused by subsequent simulations. (The environment variable
+# FBPIC_CACHE_DIR can be used to change it ; set it to an empty string
+# in order to disable the disk cache ; see docs/source/how_to_run.rst.)
+# The version number should be increased whenever the calculation of
+# the matrices is modified.
+default_dht_cache_dir = os.path.join( os.path.expanduser('~'), '.fbpic_cache' )
+dht_cache_version = 1
+
+# Function that renames a file, replacing the destination if it exists
+# (os.replace is not available in Python 2, where os.rename does this
+# on POSIX systems)
+replace_file = getattr( os, 'replace', os.rename )
+
+
+def calculate_dht_matrices( p, m, Nr, rmax ):
+    """
+    Calculate the zeros of the Bessel function and the matrices M and invM
+    of the DHT of order p, for the azimuthal mode m (see `DHT`)
+
+    Returns:
+    ---------
+    A tuple (alphas, M, invM) of a real 1darray and two real 2darrays
+    """
+    # Get the zeros of the Bessel function
+    alphas = get_bessel_zeros( m, Nr )
+
+    # Calculate the spectral grid
+    nu = 1./(2*np.pi*rmax) * alphas
+
+    # Calculate the spatial grid (Uniform grid with an half-cell offset)
+    r = (rmax*1./Nr) * ( np.arange(Nr) + 0.5 )
+
+    # Calculate and store the inverse matrix invM
+    # (imposed by the constraints on the DHT of Bessel modes)
+    # NB: When compared with the FBPIC article, all the matrices here
+    # are calculated in transposed form. This is done so as to use the
+    # `dot` and `gemm` functions, in the `transform` method.
+    invM = np.empty((Nr, Nr))
+    if p == m:
+        p_denom = p+1
+    else:
+        p_denom = p
+    denom = np.pi * rmax**2 * jv( p_denom, alphas )**2
+    num = jv( p, 2*np.pi*np.multiply.outer( nu, r ) )
+    # Get the inverse matrix
+    if m!=0:
+        invM[1:, :] = num[1:, :] / denom[1:, np.newaxis]
+        # In this case, the functions are represented by Bessel functions
+        # *and* an additional mode (below) which satisfies the same
+        # algebric relations for curl/div/grad as the regular Bessel modes,
+        # with the value kperp=0.
+        # The normalization of this mode is arbitrary, and is chosen
+        # so that the condition number of invM is close to 1
+        if p==m-1:
+            invM[0, :] = r**(m-1) * 1./( np.pi * rmax**(m+1) )
+        else:
+            invM[0, :] = 0.
+    else :
+        invM[:, :] = num[:, :] / denom[:, np.newaxis]
+
+    # Calculate the matrix M by inverting invM
+    M = np.empty((Nr, Nr))
+    if m !=0 and p != m-1:
+        # Pseudo-inverse of the full-rank (Nr-1) x Nr matrix invM[1:,:],
+        # calculated from the QR decomposition of its transpose
+        # (invM[1:,:] = R^T Q^T, hence pinv = Q R^-T ; cheaper than SVD)
+        Q, R = np.linalg.qr( invM[1:,:].T )
+        M[:, 1:] = np.dot( Q, np.linalg.solve( R.T, np.eye(Nr-1) ) )
+        M[:, 0] = 0.
+    else:
+        M[:, :] = np.linalg.solve( invM, np.eye(Nr) )
+
+    return( alphas, M, invM )
+
+
+def get_dht_matrices( p, m, Nr, rmax ):
+    """
+    Return the zeros of the Bessel function and the matrices M and invM
+    of the DHT (see `calculate_dht_matrices`)
+
+    The result is stored in `dht_matrices_cache`, so that it is calculated
+    only once per process for given values of (p, m, Nr, rmax). It is also
+    stored on disk, in the folder given by the environment variable
+    FBPIC_CACHE_DIR (`default_dht_cache_dir` if it is not set), provided
+    that this folder can be written, so that it can be reused by
+    subsequent simulations.
+
+    Returns:
+    ---------
+    A tuple (alphas, M, invM) of a real 1darray and two real 2darrays
+    """
+    key = (p, m, Nr, rmax)
+    if key in dht_matrices_cache:
+        return( dht_matrices_cache[key] )
+
+    # Try to load the matrices from the disk cache
+    matrices = None
+    dht_cache_dir = os.environ.get( 'FBPIC_CACHE_DIR', default_dht_cache_dir )
+    if dht_cache_dir:
+        file_name = hashlib.sha1( ( '%d-%d-%d-%r-%d' %(p, m, Nr,
+            float(rmax), dht_cache_version) ).encode() ).hexdigest() + '.npz'
+        file_path = os.path.join( dht_cache_dir, file_name )
+        if os.path.exists( file_path ):
+            try:
+                with np.load( file_path ) as data:
+                    matrices = ( data['alphas'], data['M'], data['invM'] )
+                if matrices[1].shape != (Nr, Nr):
+                    matrices = None
+            except Exception:
+                # Corrupted file: recalculate the matrices
+                matrices = None
+
+    # Otherwise, calculate them and try to store them on disk
+    if matrices is None:
+        matrices = calculate_dht_matrices( p, m, Nr, rmax )
+        if dht_cache_dir:
+            tmp_path = None
+            try:
+                try:
+                    os.makedirs( dht_cache_dir )
+                except OSError:
+                    if not os.path.isdir( dht_cache_dir ):
+                        raise
+                # Write to a temporary file and rename it, so that other
+                # processes never read a partially-written file
+                fd, tmp_path = tempfile.mkstemp(
+                    dir=dht_cache_dir, suffix='.tmp' )
+                with os.fdopen( fd, 'wb' ) as f:
+                    np.savez( f, alphas=matrices[0],
+                        M=matrices[1], invM=matrices[2] )
+                # mkstemp creates the file with mode 0600: use the default
+                # permissions instead, so that a shared cache folder
+                # can be read by other users
+                umask = os.umask( 0 )
+                os.umask( umask )
+                os.chmod( tmp_path, 0o666 & ~umask )
+                replace_file( tmp_path, file_path )
+            except OSError:
+                # The cache folder cannot be written: skip the disk cache
+                if (tmp_path is not None) and os.path.exists( tmp_path ):
+                    os.remove( tmp_path )
+
+    dht_matrices_cache[key] = matrices
+    return( matrices )
+
 
 class DHT(object):
     """
     Class that allows to perform the Discrete Hankel Transform.
     """
 
-    def __init__(self, p, m, Nr, Nz, rmax, use_cuda=False ):
+    def __init__(self, p, m, Nr, Nz, rmax, use_cuda=False,
+                        dtype=np.float64 ):
         """
         Calculate the r (position) and nu (frequency) grid
         on which the transform will operate.
@@ -51,6 +270,14 @@ class DHT(object):
 
         use_cuda: bool, optional
         Whether to use the GPU for the Hankel transform
+
+        dtype: numpy dtype, optional
+        The floating-point type used for the matrix product (either
+        np.float64 or np.float32). Single precision halves the memory
+        traffic of the transform, at the cost of accuracy ; it is
+        only used if the round-trip error of the single-precision
+        matrices stays below `single_precision_tolerance`.
+        (The input and output arrays remain complex128 in all cases.)
         """
         # Register whether to use the GPU.
         # If yes, initialize the corresponding cuda object
@@ -71,13 +298,10 @@ class DHT(object):
         self.rmax = rmax
         self.Nz = Nz
 
-        # Calculate the zeros of the Bessel function
-        if m !=0:
-            # In this case, 0 is a zero of the Bessel function of order m.
-            # It turns out that it is needed to reconstruct the signal for p=0.
-            alphas = np.hstack( (np.array([0.]), jn_zeros(m, Nr-1)) )
-        else:
-            alphas = jn_zeros(m, Nr)
+        # Get the zeros of the Bessel function and the matrices M and invM
+        # (from the cache if they were already calculated, see
+        # `get_dht_matrices`)
+        alphas, self.M, self.invM = get_dht_matrices( p, m, Nr, rmax )
 
         # Calculate the spectral grid
         self.nu = 1./(2*np.pi*rmax) * alphas
@@ -85,41 +309,31 @@ class DHT(object):
         # Calculate the spatial grid (Uniform grid with an half-cell offset)
         self.r = (rmax*1./Nr) * ( np.arange(Nr) + 0.5 )
 
-        # Calculate and store the inverse matrix invM
-        # (imposed by the constraints on the DHT of Bessel modes)
-        # NB: When compared with the FBPIC article, all the matrices here
-        # are calculated in transposed form. This is done so as to use the
-        # `dot` and `gemm` functions, in the `transform` method.
-        self.invM = np.empty((Nr, Nr))
-        if p == m:
-            p_denom = p+1
-        else:
-            p_denom = p
-        denom = np.pi * rmax**2 * jn( p_denom, alphas)**2
-        num = jn( p, 2*np.pi* self.r[np.newaxis,:]*self.nu[:,np.newaxis] )
-        # Get the inverse matrix
-        if m!=0:
-            self.invM[1:, :] = num[1:, :] / denom[1:, np.newaxis]
-            # In this case, the functions are represented by Bessel functions
-            # *and* an additional mode (below) which satisfies the same
-            # algebric relations for curl/div/grad as the regular Bessel modes,
-            # with the value kperp=0.
-            # The normalization of this mode is arbitrary, and is chosen
-            # so that the condition number of invM is close to 1
-            if p==m-1:
-                self.invM[0, :] = self.r**(m-1) * 1./( np.pi * rmax**(m+1) )
+        # Register whether the first column of M and the first row of invM
+        # are zero (see `calculate_dht_matrices`), in which case they are
+        # skipped in the matrix products
+        self.skip_first = (m != 0) and (p != m-1)
+
+        # Cast the matrices to single precision if requested,
+        # provided that the accuracy of the transform remains adequate
+        self.dtype = np.dtype(dtype)
+        if self.dtype == np.float32:
+            M32 = self.M.astype(np.float32)
+            invM32 = self.invM.astype(np.float32)
+            # Error of a forward + backward transform, compared to
+            # the double-precision matrices
+            error = abs( np.dot( M32.astype(np.float64), invM32 )
+                         - np.dot( self.M, self.invM ) ).max()
+            if error < single_precision_tolerance:
+                self.M = M32
+                self.invM = invM32
             else:
-                self.invM[0, :] = 0.
-        else :
-            self.invM[:, :] = num[:, :] / denom[:, np.newaxis]
-
-        # Calculate the matrix M by inverting invM
-        self.M = np.empty((Nr, Nr))
-        if m !=0 and p != m-1:
-            self.M[:, 1:] = np.linalg.pinv( self.invM[1:,:] )
-            self.M[:, 0] = 0.
-        else:
-            self.M = np.linalg.inv( self.invM )
+                warnings.warn('Single precision is not accurate enough for '
+                    'the Hankel transform (error %.2e).\n'
+                    'Using double precision instead.' %error )
+                self.dtype = np.dtype(np.float64)
+        elif self.dtype != np.float64:
+            raise ValueError('dtype must be either np.float64 or np.float32')
 
         # Copy the matrices to the GPU if needed
         if self.use_cuda:
@@ -130,24 +344,61 @@ class DHT(object):
         # as a real 2Nz x Nr grid, before performing the matrix product
         # (This is because a matrix product of reals is faster than a matrix
         # product of complexs, and the real-complex conversion is negligible.)
+        # (The buffers are enlarged when a batched transform of several
+        # arrays at once needs more rows, see `get_buffers`)
+        self.n_batch_max = 0
+        self.get_buffers( 1 )
         if not self.use_cuda:
-            # Initialize real buffer arrays on the CPU
-            zero_array = np.zeros((2*Nz, Nr), dtype=np.float64)
-            self.array_in = zero_array.copy()
-            self.array_out = zero_array.copy()
+            # Check whether to perform the matrix product by blocks of rows
+            self.use_cpu_blocks = ( get_blas_nthreads() == 1 )
         else:
-            # Initialize real buffer arrays on the GPU
-            zero_array = np.zeros((2*Nz, Nr), dtype=np.float64)
-            self.d_in = cupy.asarray( zero_array )
-            self.d_out = cupy.asarray( zero_array )
-            # Initialize cuBLAS
+            # Initialize cuBLAS, and select the gemm function
+            # (in single or double precision)
             self.blas = device.get_cublas_handle()
+            self.gemm = cublas.sgemm if self.dtype == np.float32 \
+                else cublas.dgemm
             # Set optimal number of CUDA threads per block
             # for copy 2d real/complex (determined empirically)
             copy_tpb = (8,32) if cuda_gpu_model == "V100" else (2,16)
             # Initialize the threads per block and block per grid
             self.dim_grid, self.dim_block = cuda_tpb_bpg_2d(Nz, Nr, *copy_tpb)
 
+    def get_buffers( self, n_batch ):
+        """
+        Return the real input and output buffers that are used to
+        perform the transform of `n_batch` complex arrays at once.
+
+        The buffers have shape (2*n_batch*Nz, Nr): the real and imaginary
+        parts of the i-th array are stored in the rows 2*i*Nz to 2*(i+1)*Nz.
+        A single pair of buffers is allocated, for the largest value of
+        `n_batch` used so far, and smaller batches use its first rows.
+        (When the buffers are enlarged, their previous content is lost.)
+
+        Parameters:
+        ------------
+        n_batch: int
+        Number of complex arrays that are transformed together
+
+        Returns:
+        ---------
+        A tuple of two real 2darrays (on the GPU if use_cuda is True)
+        """
+        if n_batch > self.n_batch_max:
+            zero_array = np.zeros((2*n_batch*self.Nz, self.Nr),
+                                    dtype=self.dtype)
+            if self.use_cuda:
+                self.d_in = cupy.asarray( zero_array )
+                self.d_out = cupy.asarray( zero_array )
+            else:
+                self.array_in = zero_array
+                self.array_out = zero_array.copy()
+            self.n_batch_max = n_batch
+        n_rows = 2*n_batch*self.Nz
+        if self.use_cuda:
+            return( self.d_in[:n_rows], self.d_out[:n_rows] )
+        else:
+            return( self.array_in[:n_rows], self.array_out[:n_rows] )
+
 
     def get_r(self):
         """
@@ -184,24 +435,7 @@ class DHT(object):
         G: 2darray of complex values
         Array where the result will be stored
         """
-        # Perform the matrix product with M
-        if self.use_cuda:
-            # Convert C-order, complex array `F` to F-order, real `d_in`
-            cuda_copy_2dC_to_2dR[self.dim_grid, self.dim_block]( F, self.d_in )
-            # Call cuBLAS gemm kernel
-            cublas.dgemm(self.blas, 0, 0, self.Nr, 2*self.Nz, self.Nr,
-                         1, self.d_M.data.ptr, self.Nr,
-                            self.d_in.data.ptr, self.Nr,
-                         0, self.d_out.data.ptr, self.Nr)
-            # Convert F-order, real `d_out` to the C-order, complex `G`
-            cuda_copy_2dR_to_2dC[self.dim_grid, self.dim_block]( self.d_out, G )
-        else:
-            # Convert complex array `F` to real array `array_in`
-            numba_copy_2dC_to_2dR( F, self.array_in )
-            # Perform real matrix product (faster than complex matrix product)
-            np.dot( self.array_in, self.M, out=self.array_out )
-            # Convert real array `array_out` to complex array `G`
-            numba_copy_2dR_to_2dC( self.array_out, G )
+        self.transform_batched( [F], [G] )
 
 
     def inverse_transform( self, G, F ):
@@ -215,21 +449,216 @@ class DHT(object):
         F: 2darray of real or complex values
         Array where the result will be stored
         """
-        # Perform the matrix product with invM
+        self.inverse_transform_batched( [G], [F] )
+
+
+    def transform_batched( self, F_list, G_list ):
+        """
+        Perform the Hankel transform of each array in F_list, with a
+        single matrix product for all of them.
+
+        This is faster than calling `transform` for each array separately,
+        since the matrix M is read only once and the matrix product
+        is large enough to make efficient use of the hardware.
+
+        Parameters:
+        ------------
+        F_list: list of 2darrays of complex values
+        Arrays containing the discrete values of the functions for which
+        the discrete Hankel transform is to be calculated.
+
+        G_list: list of 2darrays of complex values
+        Arrays where the results will be stored
+        """
+        self.copy_to_buffer( F_list )
+        self.transform_buffers( len(F_list) )
+        self.copy_from_buffer( G_list )
+
+
+    def inverse_transform_batched( self, G_list, F_list ):
+        """
+        Performs the MDHT of each array in G_list, with a single matrix
+        product for all of them, and stores the results in F_list
+
+        G_list: list of 2darrays of complex values
+        Arrays containing the values from which to compute the DHT
+
+        F_list: list of 2darrays of complex values
+        Arrays where the results will be stored
+        """
+        self.copy_to_buffer( G_list )
+        self.inverse_transform_buffers( len(G_list) )
+        self.copy_from_buffer( F_list )
+
+
+    def inverse_transform_to_buffer( self, G_list ):
+        """
+        Perform the MDHT of each array in G_list, and return the real
+        output buffer instead of converting it to complex arrays.
+
+        This avoids the real-to-complex conversion when the result is
+        directly used by another kernel (see `get_buffers` for the layout
+        of the buffer).
+
+        Parameters:
+        ------------
+        G_list: list of 2darrays of complex values
+        Arrays containing the values from which to compute the DHT
+
+        Returns:
+        ---------
+        A real 2darray of shape (2*len(G_list)*Nz, Nr)
+        (on the GPU if use_cuda is True), which is overwritten
+        by the next transform of the same size
+        """
+        self.copy_to_buffer( G_list )
+        self.inverse_transform_buffers( len(G_list) )
+        _, array_out = self.get_buffers( len(G_list) )
+        return( array_out )
+
+
+    def copy_to_buffer( self, arrays, i_start=0 ):
+        """
+        Convert the complex arrays in `arrays` to the real input buffer
+        (see `get_buffers`), before performing the matrix product.
+
+        Parameters:
+        ------------
+        arrays: list of 2darrays of complex values
+
+        i_start: int, optional
+        Position, in the buffer, of the first array of `arrays`
+        (The buffer should already be large enough when i_start > 0,
+        since enlarging it discards the arrays that it contains.)
+        """
+        array_in, _ = self.get_buffers( i_start + len(arrays) )
+        Nz2 = 2*self.Nz
+        for i in range(i_start, i_start + len(arrays)):
+            if self.use_cuda:
+                # Convert C-order, complex array to F-order, real `d_in`
+                cuda_copy_2dC_to_2dR[self.dim_grid, self.dim_block](
+                    arrays[i-i_start], array_in[i*Nz2:(i+1)*Nz2] )
+            else:
+                # Convert complex array to real array `array_in`
+                numba_copy_2dC_to_2dR(
+                    arrays[i-i_start], array_in[i*Nz2:(i+1)*Nz2] )
+
+
+    def copy_from_buffer( self, arrays, i_start=0 ):
+        """
+        Convert the real output buffer (see `get_buffers`) to the
+        complex arrays in `arrays`, after performing the matrix product.
+
+        Parameters:
+        ------------
+        arrays: list of 2darrays of complex values
+
+        i_start: int, optional
+        Position, in the buffer, of the first array of `arrays`
+        """
+        _, array_out = self.get_buffers( i_start + len(arrays) )
+        Nz2 = 2*self.Nz
+        for i in range(i_start, i_start + len(arrays)):
+            if self.use_cuda:
+                # Convert F-order, real `d_out` to C-order, complex array
+                cuda_copy_2dR_to_2dC[self.dim_grid, self.dim_block](
+                    array_out[i*Nz2:(i+1)*Nz2], arrays[i-i_start] )
+            else:
+                # Convert real array `array_out` to complex array
+                numba_copy_2dR_to_2dC(
+                    array_out[i*Nz2:(i+1)*Nz2], arrays[i-i_start] )
+
+
+    def transform_buffers( self, n_batch=1 ):
+        """
+        Perform the Hankel transform of the real input buffer, and store
+        the result in the real output buffer (see `get_buffers`).
+
+        This only performs the matrix product: filling the input buffer
+        and reading the output buffer is left to the caller, so that the
+        real/complex conversion can be fused with other operations.
+
+        Parameters:
+        ------------
+        n_batch: int
+        Number of complex arrays stored in the buffers
+        """
+        if self.use_cuda:
+            M = self.d_M
+        else:
+            M = self.M
+        if self.skip_first:
+            # The first column of M is zero: skip it in the product
+            self.buffer_matrix_product( M, n_batch, out_start=1 )
+        else:
+            self.buffer_matrix_product( M, n_batch )
+
+
+    def inverse_transform_buffers( self, n_batch=1 ):
+        """
+        Perform the inverse Hankel transform of the real input buffer,
+        and store the result in the real output buffer (see `get_buffers`
+        and `transform_buffers`)
+
+        Parameters:
+        ------------
+        n_batch: int
+        Number of complex arrays stored in the buffers
+        """
         if self.use_cuda:
-            # Convert C-order, complex array `G` to F-order, real `d_in`
-            cuda_copy_2dC_to_2dR[self.dim_grid, self.dim_block](G, self.d_in )
-            # Call cuBLAS gemm kernel
-            cublas.dgemm(self.blas, 0, 0, self.Nr, 2*self.Nz, self.Nr,
-                         1, self.d_invM.data.ptr, self.Nr,
-                            self.d_in.data.ptr, self.Nr,
-                         0, self.d_out.data.ptr, self.Nr)
-            # Convert the F-order d_out array to the C-order F array
-            cuda_copy_2dR_to_2dC[self.dim_grid, self.dim_block]( self.d_out, F )
+            invM = self.d_invM
+        else:
+            invM = self.invM
+        if self.skip_first:
+            # The first row of invM is zero: skip it in the product
+            self.buffer_matrix_product( invM, n_batch, in_start=1 )
+        else:
+            self.buffer_matrix_product( invM, n_batch )
+
+
+    def buffer_matrix_product( self, matrix, n_batch, in_start=0, out_start=0 ):
+        """
+        Multiply the real input buffer by the real matrix `matrix`,
+        and store the result in the real output buffer.
+
+        Parameters:
+        ------------
+        matrix: 2darray of reals
+        The matrix M or invM (on the GPU if use_cuda is True)
+
+        n_batch: int
+        Number of complex arrays stored in the buffers
+
+        in_start, out_start: int (0 or 1), optional
+        If in_start is 1, the first row of `matrix` is assumed to be zero,
+        and the first column of the input buffer is not read.
+        If out_start is 1, the first column of `matrix` is assumed to be
+        zero, and the first column of the output buffer is set to zero
+        instead of being calculated.
+        """
+        array_in, array_out = self.get_buffers( n_batch )
+        if self.use_cuda:
+            # Call cuBLAS gemm kernel (in single or double precision)
+            # on the sub-matrices that start at in_start and out_start
+            itemsize = self.dtype.itemsize
+            self.gemm(self.blas, 0, 0,
+                self.Nr - out_start, 2*n_batch*self.Nz, self.Nr - in_start,
+                1, matrix.data.ptr + (in_start*self.Nr+out_start)*itemsize,
+                   self.Nr,
+                   array_in.data.ptr + in_start*itemsize, self.Nr,
+                0, array_out.data.ptr + out_start*itemsize, self.Nr)
+            if out_start > 0:
+                array_out[:, :out_start] = 0.
         else:
-            # Convert complex array `G` to real array `array_in`
-            numba_copy_2dC_to_2dR( G, self.array_in )
             # Perform real matrix product (faster than complex matrix product)
-            np.dot( self.array_in, self.invM, out=self.array_out )
-            # Convert real array `array_out` to complex array `F`
-            numba_copy_2dR_to_2dC( self.array_out, F )
+            # (by blocks of `cpu_matmul_tile` rows, with single-thread BLAS)
+            matrix = matrix[in_start:, out_start:]
+            if self.use_cpu_blocks:
+                for i in range( 0, 2*n_batch*self.Nz, cpu_matmul_tile ):
+                    np.matmul( array_in[i:i+cpu_matmul_tile, in_start:],
+                        matrix, out=array_out[i:i+cpu_matmul_tile, out_start:] )
+            else:
+                np.matmul( array_in[:, in_start:], matrix,
+                           out=array_out[:, out_start:] )
+            if out_start > 0:
+                array_out[:, :out_start] = 0.
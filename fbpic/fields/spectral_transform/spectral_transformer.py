@@ -10,13 +10,13 @@ import numpy as np
 from .hankel import DHT
 from .fourier import FFT
 
-from .numba_methods import numba_rt_to_pm, numba_pm_to_rt
+from .numba_methods import numba_rt_to_pm_2dR, numba_2dR_pm_to_rt
 # Check if CUDA is available, then import CUDA functions
 from fbpic.utils.cuda import cuda_installed
 if cuda_installed:
     import cupy
     from fbpic.utils.cuda import cuda_tpb_bpg_2d
-    from .cuda_methods import cuda_rt_to_pm, cuda_pm_to_rt
+    from .cuda_methods import cuda_rt_to_pm_2dR, cuda_2dR_pm_to_rt
 
 class SpectralTransformer(object) :
     """
@@ -37,9 +37,13 @@ class SpectralTransformer(object) :
         converts a scalar field from the interpolation to the spectral grid
     - interp2spect_vect :
         converts a vector field from the interpolation to the spectral grid
+    - spect2interp_scal_batched, spect2interp_vect_batched,
+      interp2spect_scal_batched, interp2spect_vect_batched :
+        same as above, for several fields at once (batched Hankel transform)
     """
 
-    def __init__(self, Nz, Nr, m, rmax, use_cuda=False ) :
+    def __init__(self, Nz, Nr, m, rmax, use_cuda=False,
+                    dht_dtype=np.float64 ) :
         """
         Initializes the dht and fft attributes, which contain auxiliary
         matrices allowing to transform the fields quickly
@@ -54,6 +58,13 @@ class SpectralTransformer(object) :
 
         rmax : float
             The size of the simulation box along r.
+
+        use_cuda : bool, optional
+            Whether to perform the transforms on the GPU
+
+        dht_dtype : numpy dtype, optional
+            Floating-point type of the matrix product in the Hankel
+            transforms (np.float64 or np.float32 ; see `DHT`)
         """
         # Check whether to use the GPU
         self.use_cuda = use_cuda
@@ -64,9 +75,12 @@ class SpectralTransformer(object) :
             self.dim_grid, self.dim_block = cuda_tpb_bpg_2d( Nz, Nr, 1, 32 )
 
         # Initialize the DHT (local implementation, see hankel.py)
-        self.dht0 = DHT(  m, m, Nr, Nz, rmax, use_cuda=self.use_cuda )
-        self.dhtp = DHT(m+1, m, Nr, Nz, rmax, use_cuda=self.use_cuda )
-        self.dhtm = DHT(m-1, m, Nr, Nz, rmax, use_cuda=self.use_cuda )
+        self.dht0 = DHT(  m, m, Nr, Nz, rmax,
+                          use_cuda=self.use_cuda, dtype=dht_dtype )
+        self.dhtp = DHT(m+1, m, Nr, Nz, rmax,
+                          use_cuda=self.use_cuda, dtype=dht_dtype )
+        self.dhtm = DHT(m-1, m, Nr, Nz, rmax,
+                          use_cuda=self.use_cuda, dtype=dht_dtype )
 
         # Initialize the FFT
         self.fft = FFT( Nr, Nz, use_cuda=self.use_cuda )
@@ -102,11 +116,7 @@ class SpectralTransformer(object) :
            A complex array representing the fields on the interpolation
            grid, and which is overwritten by this function.
         """
-        # Perform the inverse DHT (along axis -1, which corresponds to r)
-        self.dht0.inverse_transform( spect_array, self.spect_buffer_r )
-
-        # Then perform the inverse FFT (along axis 0, which corresponds to z)
-        self.fft.inverse_transform( self.spect_buffer_r, interp_array )
+        self.spect2interp_scal_batched( [spect_array], [interp_array] )
 
     def spect2interp_vect( self, spect_array_p, spect_array_m,
                           interp_array_r, interp_array_t ) :
@@ -125,34 +135,8 @@ class SpectralTransformer(object) :
            Complex arrays representing the fields on the interpolation
            grid, and which are overwritten by this function.
         """
-        # Perform the inverse DHT (along axis -1, which corresponds to r)
-        self.dhtp.inverse_transform( spect_array_p, self.spect_buffer_p )
-        self.dhtm.inverse_transform( spect_array_m, self.spect_buffer_m )
-
-        # Combine the p and m components to obtain the r and t components
-        if self.use_cuda :
-            # Combine them on the GPU
-            # (self.spect_buffer_r and self.spect_buffer_t are
-            # passed in the following line, in order to make things
-            # explicit, but they actually point to the same object
-            # as self.spect_buffer_p, self.spect_buffer_m,
-            # for economy of memory)
-            cuda_pm_to_rt[self.dim_grid, self.dim_block](
-                self.spect_buffer_p, self.spect_buffer_m,
-                self.spect_buffer_r, self.spect_buffer_t )
-        else :
-            # Combine them on the CPU
-            # (self.spect_buffer_r and self.spect_buffer_t are
-            # passed in the following line, in order to make things
-            # explicit, but they actually point to the same object
-            # as self.spect_buffer_p, self.spect_buffer_m,
-            # for economy of memory)
-            numba_pm_to_rt( self.spect_buffer_p, self.spect_buffer_m,
-                            self.spect_buffer_r, self.spect_buffer_t )
-
-        # Finally perform the FFT (along axis 0, which corresponds to z)
-        self.fft.inverse_transform( self.spect_buffer_r, interp_array_r )
-        self.fft.inverse_transform( self.spect_buffer_t, interp_array_t )
+        self.spect2interp_vect_batched( [spect_array_p], [spect_array_m],
+                                        [interp_array_r], [interp_array_t] )
 
     def interp2spect_scal( self, interp_array, spect_array ) :
         """
@@ -170,11 +154,7 @@ class SpectralTransformer(object) :
            A complex array representing the fields in spectral space,
            and which is overwritten by this function.
         """
-        # Perform the FFT first (along axis 0, which corresponds to z)
-        self.fft.transform( interp_array, self.spect_buffer_r )
-
-        # Then perform the DHT (along axis -1, which corresponds to r)
-        self.dht0.transform( self.spect_buffer_r, spect_array )
+        self.interp2spect_scal_batched( [interp_array], [spect_array] )
 
     def interp2spect_vect( self, interp_array_r, interp_array_t,
                            spect_array_p, spect_array_m ) :
@@ -193,31 +173,142 @@ class SpectralTransformer(object) :
            Complex arrays representing the fields in spectral space,
            and which are overwritten by this function.
         """
-        # Perform the FFT first (along axis 0, which corresponds to z)
-        self.fft.transform( interp_array_r, self.spect_buffer_r )
-        self.fft.transform( interp_array_t, self.spect_buffer_t )
-
-        # Combine the r and t components to obtain the p and m components
-        if self.use_cuda :
-            # Combine them on the GPU
-            # (self.spect_buffer_p and self.spect_buffer_m are
-            # passed in the following line, in order to make things
-            # explicit, but they actually point to the same object
-            # as self.spect_buffer_r, self.spect_buffer_t,
-            # for economy of memory)
-            cuda_rt_to_pm[self.dim_grid, self.dim_block](
-                self.spect_buffer_r, self.spect_buffer_t,
-                self.spect_buffer_p, self.spect_buffer_m )
-        else :
-            # Combine them on the GPU
-            # (self.spect_buffer_p and self.spect_buffer_m are
-            # passed in the following line, in order to make things
-            # explicit, but they actually point to the same object
-            # as self.spect_buffer_r, self.spect_buffer_t,
-            # for economy of memory)
-            numba_rt_to_pm( self.spect_buffer_r, self.spect_buffer_t,
-                            self.spect_buffer_p, self.spect_buffer_m )
+        self.interp2spect_vect_batched( [interp_array_r], [interp_array_t],
+                                        [spect_array_p], [spect_array_m] )
+
+    def spect2interp_scal_batched( self, spect_arrays, interp_arrays ) :
+        """
+        Convert several scalar fields from the spectral grid
+        to the interpolation grid, with a single (batched) Hankel transform.
+
+        Parameters
+        ----------
+        spect_arrays : list of 2darrays of complexs
+           Complex arrays representing the fields in spectral space
+
+        interp_arrays : list of 2darrays of complexs
+           Complex arrays representing the fields on the interpolation
+           grid, and which are overwritten by this function.
+        """
+        n_batch = len(spect_arrays)
+
+        # Perform the inverse DHT (along axis -1, which corresponds to r)
+        # (The results are kept in the real output buffer of the DHT)
+        self.dht0.copy_to_buffer( spect_arrays )
+        self.dht0.inverse_transform_buffers( n_batch )
+
+        for i in range(n_batch):
+            # Convert each result to the spectral buffer, and perform
+            # the inverse FFT (along axis 0, which corresponds to z)
+            self.dht0.copy_from_buffer( [self.spect_buffer_r], i_start=i )
+            self.fft.inverse_transform( self.spect_buffer_r, interp_arrays[i] )
+
+    def spect2interp_vect_batched( self, spect_arrays_p, spect_arrays_m,
+                                   interp_arrays_r, interp_arrays_t ) :
+        """
+        Convert several transverse vector fields in the spectral space
+        (e.g. [Ep, Bp], [Em, Bm]) to the interpolation grid
+        (e.g. [Er, Br], [Et, Bt]), with batched Hankel transforms.
+
+        Parameters
+        ----------
+        spect_arrays_p, spect_arrays_m : lists of 2darrays
+           Complex arrays representing the fields in spectral space
+
+        interp_arrays_r, interp_arrays_t : lists of 2darrays
+           Complex arrays representing the fields on the interpolation
+           grid, and which are overwritten by this function.
+        """
+        n_batch = len(spect_arrays_p)
 
         # Perform the inverse DHT (along axis -1, which corresponds to r)
-        self.dhtp.transform( self.spect_buffer_p, spect_array_p )
-        self.dhtm.transform( self.spect_buffer_m, spect_array_m )
+        # (The results are kept in the real output buffers of the DHTs)
+        array_p = self.dhtp.inverse_transform_to_buffer( spect_arrays_p )
+        array_m = self.dhtm.inverse_transform_to_buffer( spect_arrays_m )
+
+        Nz2 = 2*self.dhtp.Nz
+        for i in range(n_batch):
+            # Combine the p and m components to obtain the r and t components
+            # (directly from the real output buffers of the DHTs)
+            if self.use_cuda :
+                cuda_2dR_pm_to_rt[self.dim_grid, self.dim_block](
+                    array_p[i*Nz2:(i+1)*Nz2], array_m[i*Nz2:(i+1)*Nz2],
+                    self.spect_buffer_r, self.spect_buffer_t )
+            else :
+                numba_2dR_pm_to_rt(
+                    array_p[i*Nz2:(i+1)*Nz2], array_m[i*Nz2:(i+1)*Nz2],
+                    self.spect_buffer_r, self.spect_buffer_t )
+            # Finally perform the FFT (along axis 0, which corresponds to z)
+            self.fft.inverse_transform( self.spect_buffer_r,
+                                        interp_arrays_r[i] )
+            self.fft.inverse_transform( self.spect_buffer_t,
+                                        interp_arrays_t[i] )
+
+    def interp2spect_scal_batched( self, interp_arrays, spect_arrays ) :
+        """
+        Convert several scalar fields from the interpolation grid
+        to the spectral grid, with a single (batched) Hankel transform.
+
+        Parameters
+        ----------
+        interp_arrays : list of 2darrays
+           Complex arrays representing the fields on the interpolation grid
+
+        spect_arrays : list of 2darrays
+           Complex arrays representing the fields in spectral space,
+           and which are overwritten by this function.
+        """
+        n_batch = len(interp_arrays)
+        # Allocate the real input buffer of the DHT for all the fields
+        self.dht0.get_buffers( n_batch )
+
+        for i in range(n_batch):
+            # Perform the FFT first (along axis 0, which corresponds to z)
+            self.fft.transform( interp_arrays[i], self.spect_buffer_r )
+            # Convert the result to the real input buffer of the DHT
+            self.dht0.copy_to_buffer( [self.spect_buffer_r], i_start=i )
+
+        # Then perform the DHT (along axis -1, which corresponds to r)
+        self.dht0.transform_buffers( n_batch )
+        self.dht0.copy_from_buffer( spect_arrays )
+
+    def interp2spect_vect_batched( self, interp_arrays_r, interp_arrays_t,
+                                   spect_arrays_p, spect_arrays_m ) :
+        """
+        Convert several transverse vector fields from the interpolation grid
+        (e.g. [Er, Br], [Et, Bt]) to the spectral space
+        (e.g. [Ep, Bp], [Em, Bm]), with batched Hankel transforms.
+
+        Parameters
+        ----------
+        interp_arrays_r, interp_arrays_t : lists of 2darrays
+           Complex arrays representing the fields on the interpolation grid
+
+        spect_arrays_p, spect_arrays_m : lists of 2darrays
+           Complex arrays representing the fields in spectral space,
+           and which are overwritten by this function.
+        """
+        n_batch = len(interp_arrays_r)
+        array_p, _ = self.dhtp.get_buffers( n_batch )
+        array_m, _ = self.dhtm.get_buffers( n_batch )
+
+        Nz2 = 2*self.dhtp.Nz
+        for i in range(n_batch):
+            # Perform the FFT first (along axis 0, which corresponds to z)
+            self.fft.transform( interp_arrays_r[i], self.spect_buffer_r )
+            self.fft.transform( interp_arrays_t[i], self.spect_buffer_t )
+            # Combine the r and t components to obtain the p and m components
+            # (directly into the real input buffers of the DHTs)
+            if self.use_cuda :
+                cuda_rt_to_pm_2dR[self.dim_grid, self.dim_block](
+                    self.spect_buffer_r, self.spect_buffer_t,
+                    array_p[i*Nz2:(i+1)*Nz2], array_m[i*Nz2:(i+1)*Nz2] )
+            else :
+                numba_rt_to_pm_2dR( self.spect_buffer_r, self.spect_buffer_t,
+                    array_p[i*Nz2:(i+1)*Nz2], array_m[i*Nz2:(i+1)*Nz2] )
+
+        # Perform the DHT (along axis -1, which corresponds to r)
+        self.dhtp.transform_buffers( n_batch )
+        self.dhtm.transform_buffers( n_batch )
+        self.dhtp.copy_from_buffer( spect_arrays_p )
+        self.dhtm.copy_from_buffer( spect_arrays_m )
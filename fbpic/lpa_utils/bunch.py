@@ -876,8 +876,7 @@ def get_space_charge_fields( sim, ptcl, direction='forward' ):
         for m in range(global_fld.Nm) :
             get_space_charge_spect( global_fld.spect[m], gamma, direction )
         # - Convert the fields back to real space
-        global_fld.spect2interp( 'E' )
-        global_fld.spect2interp( 'B' )
+        global_fld.spect2interp( 'EB' )
 
     # Communicate the results from proc 0 to the other procs
     # and add it to the interpolation grid of sim.fld.
@@ -213,5 +213,4 @@ def calculate_laser_fields( fld, propag_direction ):
         spect[m].Bz[:,:] = inv_w * spect[m].kr * ( spect[m].Ep + spect[m].Em )
 
     # Go back to interpolation space
-    fld.spect2interp('E')
-    fld.spect2interp('B')
+    fld.spect2interp('EB')
@@ -60,7 +60,7 @@ class Simulation(object):
                  gamma_boost=None, use_all_mpi_ranks=True,
                  particle_shape='linear', verbose_level=1,
                  smoother=None, use_ruyten_shapes=True,
-                 use_modified_volume=True ):
+                 use_modified_volume=True, dht_precision='double' ):
         """
         Initializes a simulation.
 
@@ -225,6 +225,15 @@ class Simulation(object):
             Whether to use a slightly-modified, effective cell volume, that
             ensures that the charge deposited near the axis is correctly
             taken into account by the spectral cylindrical Maxwell solver.
+
+        dht_precision: string, optional
+            The floating-point precision of the matrix products of the
+            Hankel transforms, either `'double'` (default) or `'single'`.
+            Single precision reduces the memory traffic of the transforms,
+            at the cost of accuracy (relative error of order 1e-6). It is
+            only used if the error of a forward and backward transform
+            remains small ; otherwise a warning is printed and double
+            precision is used.
         """
         # Check whether to use CUDA
         self.use_cuda = use_cuda
@@ -303,7 +312,8 @@ class Simulation(object):
                     # Only create threading buffers when running on CPU
                     create_threading_buffers=(self.use_cuda is False),
                     use_ruyten_shapes=use_ruyten_shapes,
-                    use_modified_volume=use_modified_volume )
+                    use_modified_volume=use_modified_volume,
+                    dht_precision=dht_precision )
 
         # Initialize the electrons and the ions
         self.grid_shape = self.fld.interp[0].Ez.shape
@@ -405,8 +415,7 @@ class Simulation(object):
         self.comm.exchange_fields(fld.interp, 'E', 'replace')
         self.comm.exchange_fields(fld.interp, 'B', 'replace')
         self.comm.damp_EB_open_boundary( fld.interp )
-        fld.interp2spect('E')
-        fld.interp2spect('B')
+        fld.interp2spect('EB')
         if self.use_pml:
             fld.interp2spect('E_pml')
             fld.interp2spect('B_pml')
@@ -725,8 +734,7 @@ class Simulation(object):
         #   to prepare for damp/exchange
         if self.use_pml:
             # Exchange/damp operation in z and r ; do full transform
-            fld.spect2interp('E')
-            fld.spect2interp('B')
+            fld.spect2interp('EB')
             fld.spect2interp('E_pml')
             fld.spect2interp('B_pml')
         else:
@@ -745,8 +753,7 @@ class Simulation(object):
         # - Update spectral space (and interpolation space if needed)
         if self.use_pml:
             # Exchange/damp operation in z and r ; do full transform back
-            fld.interp2spect('E')
-            fld.interp2spect('B')
+            fld.interp2spect('EB')
             fld.interp2spect('E_pml')
             fld.interp2spect('B_pml')
         else:
@@ -755,8 +762,7 @@ class Simulation(object):
             fld.partial_interp2spect('E')
             fld.partial_interp2spect('B')
             # Get the corresponding fields in interpolation space
-            fld.spect2interp('E')
-            fld.spect2interp('B')
+            fld.spect2interp('EB')
 
 
     def shift_galilean_boundaries(self, dt):
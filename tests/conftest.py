@@ -0,0 +1,23 @@
+# Copyright 2016, FBPIC contributors
+# License: 3-Clause-BSD-LBNL
+"""
+This file is part of FB-PIC (Fourier-Bessel Particle-In-Cell).
+
+It configures py.test for the automated tests of FBPIC.
+"""
+import os
+import shutil
+import tempfile
+
+# Temporary folder in which the matrices of the Hankel transform are
+# stored during the tests (instead of the default folder in the home
+# directory of the user ; see fbpic/fields/spectral_transform/hankel.py)
+fbpic_cache_dir = tempfile.mkdtemp( prefix='fbpic_cache_' )
+
+def pytest_configure(config):
+    # Set the variable in the environment, so that it is also seen
+    # by the scripts that the tests launch in separate processes
+    os.environ['FBPIC_CACHE_DIR'] = fbpic_cache_dir
+
+def pytest_unconfigure(config):
+    shutil.rmtree( fbpic_cache_dir, ignore_errors=True )
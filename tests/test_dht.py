@@ -0,0 +1,194 @@
+# Copyright 2016, FBPIC contributors
+# License: 3-Clause-BSD-LBNL
+"""
+This test file is part of FB-PIC (Fourier-Bessel Particle-In-Cell).
+
+It tests the Discrete Hankel Transform (DHT) objects:
+- The storage of the matrices of the DHT in the disk cache
+  (cache hit, corrupted cache file, cache folder that cannot be written)
+- The matrix product in single precision, compared to double precision,
+  and the fallback to double precision when it is not accurate enough
+- The matrix products that skip the zero first column of M and the zero
+  first row of invM, compared to the products with the full matrices
+
+Usage:
+This file is meant to be run from the top directory of fbpic,
+by any of the following commands
+$ python tests/test_dht.py
+$ py.test -q tests/test_dht.py
+$ python setup.py test
+"""
+import os
+import shutil
+import tempfile
+import warnings
+import numpy as np
+from fbpic.fields import Fields
+from fbpic.fields.spectral_transform import hankel
+from fbpic.fields.spectral_transform.hankel import DHT, get_dht_matrices, \
+    calculate_dht_matrices
+
+# Parameters of the DHT
+use_cuda = True
+p = 2
+m = 1
+Nr = 20
+Nz = 16
+rmax = 20.e-6
+
+# -------------
+# Test function
+# -------------
+
+def test_dht_disk_cache():
+    "Function that is run by py.test, when doing `python setup.py test`"
+    temporary_dir = tempfile.mkdtemp()
+    cache_dir = os.path.join( temporary_dir, 'cache' )
+    previous_cache_dir = os.environ.get( 'FBPIC_CACHE_DIR' )
+    os.environ['FBPIC_CACHE_DIR'] = cache_dir
+    try:
+        check_dht_disk_cache( cache_dir )
+        # Point the cache to a path that cannot be created as a folder:
+        # the matrices should still be calculated
+        not_a_folder = os.path.join( temporary_dir, 'file' )
+        open( not_a_folder, 'w' ).close()
+        os.environ['FBPIC_CACHE_DIR'] = os.path.join( not_a_folder, 'cache' )
+        hankel.dht_matrices_cache.clear()
+        check_matrices( get_dht_matrices( p, m, Nr, rmax ) )
+    finally:
+        if previous_cache_dir is None:
+            os.environ.pop( 'FBPIC_CACHE_DIR' )
+        else:
+            os.environ['FBPIC_CACHE_DIR'] = previous_cache_dir
+        hankel.dht_matrices_cache.clear()
+        shutil.rmtree( temporary_dir )
+
+def check_dht_disk_cache( cache_dir ):
+    """
+    Check that the matrices are written to `cache_dir`,
+    read back from it, and recalculated if the file is corrupted
+    """
+    # Calculate the matrices and store them in the (new) folder
+    hankel.dht_matrices_cache.clear()
+    check_matrices( get_dht_matrices( p, m, Nr, rmax ) )
+    cache_files = os.listdir( cache_dir )
+    assert len( cache_files ) == 1
+    cache_file = os.path.join( cache_dir, cache_files[0] )
+    # Check that the file can be read by other users (within the umask)
+    umask = os.umask( 0 )
+    os.umask( umask )
+    assert os.stat( cache_file ).st_mode & 0o777 == 0o666 & ~umask
+
+    # Modify the stored matrices, and check that they are used
+    # when the matrices are not in memory any more (cache hit)
+    alphas, M, invM = calculate_dht_matrices( p, m, Nr, rmax )
+    np.savez( cache_file, alphas=alphas, M=2*M, invM=invM )
+    hankel.dht_matrices_cache.clear()
+    assert np.array_equal( get_dht_matrices( p, m, Nr, rmax )[1], 2*M )
+
+    # Corrupt the file, and check that the matrices are recalculated
+    with open( cache_file, 'wb' ) as f:
+        f.write( b'not a valid npz file' )
+    hankel.dht_matrices_cache.clear()
+    check_matrices( get_dht_matrices( p, m, Nr, rmax ) )
+    # The file should have been replaced by a valid one
+    hankel.dht_matrices_cache.clear()
+    check_matrices( get_dht_matrices( p, m, Nr, rmax ) )
+    assert os.listdir( cache_dir ) == cache_files
+
+def test_dht_single_precision():
+    "Function that is run by py.test, when doing `python setup.py test`"
+    F = np.random.rand(Nz, Nr) + 1.j*np.random.rand(Nz, Nr)
+    for (p_dht, m_dht) in [ (m-1, m), (m, m), (m+1, m), (0, 0), (1, 0) ]:
+        dht64 = DHT( p_dht, m_dht, Nr, Nz, rmax )
+        dht32 = DHT( p_dht, m_dht, Nr, Nz, rmax, dtype=np.float32 )
+        assert dht32.dtype == np.float32
+        # Forward transform
+        G64 = np.empty_like( F )
+        G32 = np.empty_like( F )
+        dht64.transform( F, G64 )
+        dht32.transform( F, G32 )
+        assert abs( G32 - G64 ).max() < 1.e-6 * abs( G64 ).max()
+        # Inverse transform
+        F64 = np.empty_like( F )
+        F32 = np.empty_like( F )
+        dht64.inverse_transform( G64, F64 )
+        dht32.inverse_transform( G64, F32 )
+        assert abs( F32 - F64 ).max() < 1.e-6 * abs( F64 ).max()
+
+    # Check that the option is passed on by the Fields object
+    fld = Fields( Nz, 1.e-6*Nz, Nr, rmax, 2, 1.e-15, dht_precision='single' )
+    for trans in fld.trans:
+        for dht in [ trans.dht0, trans.dhtp, trans.dhtm ]:
+            assert dht.dtype == np.float32
+
+def test_dht_single_precision_fallback():
+    "Function that is run by py.test, when doing `python setup.py test`"
+    # Require an accuracy that single precision cannot reach
+    tolerance = hankel.single_precision_tolerance
+    hankel.single_precision_tolerance = 0.
+    try:
+        with warnings.catch_warnings(record=True) as w:
+            warnings.simplefilter('always')
+            dht = DHT( p, m, Nr, Nz, rmax, dtype=np.float32 )
+    finally:
+        hankel.single_precision_tolerance = tolerance
+    # Check that a warning was issued, and that double precision is used
+    assert any( 'Single precision' in str(warning.message) for warning in w )
+    assert dht.dtype == np.float64
+    assert dht.M.dtype == np.float64
+    assert dht.array_in.dtype == np.float64
+
+def test_dht_skip_first():
+    "Function that is run by py.test, when doing `python setup.py test`"
+    F_list = [ np.random.rand(Nz, Nr) + 1.j*np.random.rand(Nz, Nr)
+               for i in range(2) ]
+    for m_dht in range(3):
+        for p_dht in [ m_dht-1, m_dht, m_dht+1 ]:
+            dht = DHT( p_dht, m_dht, Nr, Nz, rmax, use_cuda=use_cuda )
+            assert dht.skip_first == ( m_dht != 0 and p_dht != m_dht-1 )
+            if dht.use_cuda:
+                check_dht_products( dht, F_list )
+            else:
+                # Check the CPU product with and without blocks of rows
+                for use_cpu_blocks in [ True, False ]:
+                    dht.use_cpu_blocks = use_cpu_blocks
+                    check_dht_products( dht, F_list )
+
+def check_dht_products( dht, F_list ):
+    """
+    Check the forward and inverse batched transforms of `dht`
+    against the products with the full matrices M and invM
+    """
+    # (The forward transform is performed again after the inverse transform,
+    # so as to check that the values left in the buffers are not used)
+    for transform, matrix in [ (dht.transform_batched, dht.M),
+                               (dht.inverse_transform_batched, dht.invM),
+                               (dht.transform_batched, dht.M) ]:
+        G_list = [ np.empty_like( F ) for F in F_list ]
+        if dht.use_cuda:
+            import cupy
+            d_F_list = [ cupy.asarray( F ) for F in F_list ]
+            d_G_list = [ cupy.asarray( G ) for G in G_list ]
+            transform( d_F_list, d_G_list )
+            G_list = [ d_G.get() for d_G in d_G_list ]
+        else:
+            transform( F_list, G_list )
+        for F, G in zip( F_list, G_list ):
+            G_ref = np.dot( F, matrix )
+            assert abs( G - G_ref ).max() < 1.e-12 * abs( G_ref ).max()
+
+def check_matrices( matrices ):
+    """
+    Check that `matrices` are identical to the ones that are calculated
+    without the cache
+    """
+    for array, ref_array in zip( matrices,
+                                 calculate_dht_matrices( p, m, Nr, rmax ) ):
+        assert np.array_equal( array, ref_array )
+
+if __name__ == '__main__':
+    test_dht_disk_cache()
+    test_dht_single_precision()
+    test_dht_single_precision_fallback()
+    test_dht_skip_first()
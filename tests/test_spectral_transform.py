@@ -0,0 +1,162 @@
+# Copyright 2016, FBPIC contributors
+# License: 3-Clause-BSD-LBNL
+"""
+This test file is part of FB-PIC (Fourier-Bessel Particle-In-Cell).
+
+It tests the batched transforms between the interpolation grid and the
+spectral grid, by checking that they give the same result as the
+transforms of the fields one by one:
+- For the SpectralTransformer objects (`*_batched` methods)
+- For the Fields object (fieldtype 'EB', compared to 'E' and 'B')
+
+Usage:
+This file is meant to be run from the top directory of fbpic,
+by any of the following commands
+$ python tests/test_spectral_transform.py
+$ py.test -q tests/test_spectral_transform.py
+$ python setup.py test
+"""
+import numpy as np
+from fbpic.fields import Fields
+
+# Parameters
+# ----------
+use_cuda = True
+
+# Dimensions of the box
+Nz = 32
+zmax = 20.e-6
+Nr = 24
+rmax = 20.e-6
+Nm = 3
+dt = zmax/Nz/3.e8
+
+# Relative tolerance on the difference between the batched transforms
+# and the transforms of the fields one by one
+rtol = 1.e-12
+
+# -------------
+# Test function
+# -------------
+
+def test_batched_transforms():
+    "Function that is run by py.test, when doing `python setup.py test`"
+    fld = Fields( Nz, zmax, Nr, rmax, Nm, dt, use_cuda=use_cuda )
+    for m in range(Nm):
+        trans = fld.trans[m]
+        # Interpolation grid to spectral grid
+        interp_arrays = [ random_array() for i in range(4) ]
+        spect_arrays = [ to_device( fld, np.empty_like( interp_arrays[0] ) )
+                         for i in range(8) ]
+        d_interp = [ to_device( fld, array ) for array in interp_arrays ]
+        trans.interp2spect_scal( d_interp[0], spect_arrays[0] )
+        trans.interp2spect_scal( d_interp[1], spect_arrays[1] )
+        trans.interp2spect_scal_batched( d_interp[:2], spect_arrays[2:4] )
+        check_equal( fld, spect_arrays[0:2], spect_arrays[2:4] )
+        trans.interp2spect_vect( d_interp[0], d_interp[1],
+                                 spect_arrays[0], spect_arrays[1] )
+        trans.interp2spect_vect( d_interp[2], d_interp[3],
+                                 spect_arrays[2], spect_arrays[3] )
+        trans.interp2spect_vect_batched(
+            [ d_interp[0], d_interp[2] ], [ d_interp[1], d_interp[3] ],
+            [ spect_arrays[4], spect_arrays[6] ],
+            [ spect_arrays[5], spect_arrays[7] ] )
+        check_equal( fld, spect_arrays[0:4], spect_arrays[4:8] )
+
+        # Spectral grid to interpolation grid
+        spect_arrays = [ to_device( fld, random_array() ) for i in range(4) ]
+        d_interp = [ to_device( fld, np.empty_like( interp_arrays[0] ) )
+                     for i in range(8) ]
+        trans.spect2interp_scal( spect_arrays[0], d_interp[0] )
+        trans.spect2interp_scal( spect_arrays[1], d_interp[1] )
+        trans.spect2interp_scal_batched( spect_arrays[:2], d_interp[2:4] )
+        check_equal( fld, d_interp[0:2], d_interp[2:4] )
+        trans.spect2interp_vect( spect_arrays[0], spect_arrays[1],
+                                 d_interp[0], d_interp[1] )
+        trans.spect2interp_vect( spect_arrays[2], spect_arrays[3],
+                                 d_interp[2], d_interp[3] )
+        trans.spect2interp_vect_batched(
+            [ spect_arrays[0], spect_arrays[2] ],
+            [ spect_arrays[1], spect_arrays[3] ],
+            [ d_interp[4], d_interp[6] ], [ d_interp[5], d_interp[7] ] )
+        check_equal( fld, d_interp[0:4], d_interp[4:8] )
+
+        # Check that each DHT keeps a single pair of buffers, sized for
+        # the largest batch, and that smaller batches use its first rows
+        for dht in [ trans.dht0, trans.dhtp, trans.dhtm ]:
+            assert dht.n_batch_max == 2
+            for buffer_1, buffer_2 in zip( dht.get_buffers(1),
+                                           dht.get_buffers(2) ):
+                assert buffer_1.shape == ( 2*Nz, Nr )
+                assert buffer_2.shape == ( 4*Nz, Nr )
+                assert address( buffer_1 ) == address( buffer_2 )
+
+def test_fields_EB():
+    "Function that is run by py.test, when doing `python setup.py test`"
+    components = { 'interp': ['Er', 'Et', 'Ez', 'Br', 'Bt', 'Bz'],
+                   'spect': ['Ep', 'Em', 'Ez', 'Bp', 'Bm', 'Bz'] }
+    # Create two Fields objects with the same random fields
+    fld_single = Fields( Nz, zmax, Nr, rmax, Nm, dt, use_cuda=use_cuda )
+    fld_batched = Fields( Nz, zmax, Nr, rmax, Nm, dt, use_cuda=use_cuda )
+    for m in range(Nm):
+        for grid in [ 'interp', 'spect' ]:
+            for name in components[grid]:
+                array = random_array()
+                setattr( getattr( fld_single, grid )[m], name, array )
+                setattr( getattr( fld_batched, grid )[m], name, array.copy() )
+
+    # Compare the fields after the transforms, in both directions
+    for fld in [ fld_single, fld_batched ]:
+        if fld.use_cuda:
+            fld.send_fields_to_gpu()
+    fld_single.interp2spect('E')
+    fld_single.interp2spect('B')
+    fld_batched.interp2spect('EB')
+    for m in range(Nm):
+        check_equal( fld_single,
+            [ getattr( fld_single.spect[m], name )
+              for name in components['spect'] ],
+            [ getattr( fld_batched.spect[m], name )
+              for name in components['spect'] ] )
+    fld_single.spect2interp('E')
+    fld_single.spect2interp('B')
+    fld_batched.spect2interp('EB')
+    for m in range(Nm):
+        check_equal( fld_single,
+            [ getattr( fld_single.interp[m], name )
+              for name in components['interp'] ],
+            [ getattr( fld_batched.interp[m], name )
+              for name in components['interp'] ] )
+
+# -----------------
+# Utility functions
+# -----------------
+
+def random_array():
+    "Return a random complex array of shape (Nz, Nr)"
+    return( np.random.rand(Nz, Nr) + 1.j*np.random.rand(Nz, Nr) )
+
+def to_device( fld, array ):
+    "Copy `array` to the GPU, if the Fields object `fld` uses the GPU"
+    if fld.use_cuda:
+        import cupy
+        return( cupy.asarray( array ) )
+    return( array )
+
+def address( array ):
+    "Return the address of the first element of `array` (CPU or GPU array)"
+    if isinstance( array, np.ndarray ):
+        return( array.ctypes.data )
+    return( array.data.ptr )
+
+def check_equal( fld, arrays, ref_arrays ):
+    "Check that the arrays are equal to the reference arrays, within rtol"
+    for array, ref_array in zip( arrays, ref_arrays ):
+        if fld.use_cuda:
+            array = array.get()
+            ref_array = ref_array.get()
+        assert abs( array - ref_array ).max() <= rtol * abs( ref_array ).max()
+
+if __name__ == '__main__':
+    test_batched_transforms()
+    test_fields_EB()